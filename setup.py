@@ -31,4 +31,8 @@ if __name__ == '__main__':
         },
         python_requires='>=3.10',
         install_requires=requirements,
+        extras_require={
+            'jit': ['numba'],
+            'calamine': ['python-calamine'],
+        },
     )
@@ -1 +1,10 @@
-from .loader import Loader, DataFormat
+# Loader pulls in pandas, so it is only imported on first access.
+# This keeps the CLI's --help and usage errors from paying the pandas import.
+__all__ = ["Loader", "DataFormat"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from . import loader
+        return getattr(loader, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
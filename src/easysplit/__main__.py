@@ -1,9 +1,6 @@
 """CLI entry of the package."""
 
 from .config import *
-from .loader import Loader, DataFormat
-from .exr import ExchangeRates
-from . import graph
 
 import argparse
 
@@ -64,6 +61,13 @@ def main():
         help="Exchange rate. BASE/QUOTE=x means 1 BASE is converted to x QUOTE. eg., USD/HKD=7.8",
     )
     
+    parser.add_argument(
+        "--greedy",
+        action="store_true",
+        help="Settle greedily (at most N-1 transactions) instead of searching for the fewest transactions. "
+             "Recommended for large groups.",
+    )
+
     parser.add_argument(
         "--result_dump_path",
         type=str,
@@ -76,6 +80,11 @@ def main():
     )
 
     args = parser.parse_args()
+
+    # Imported only once the arguments are valid, as they pull in pandas and numpy.
+    from .loader import Loader, DataFormat
+    from .exr import ExchangeRates
+    from . import graph
     
     ########################################
     exrs = None
@@ -106,31 +115,18 @@ def main():
         else:
             debtors.append((name, -net_out))
 
-    print("Creditors:")
-    for name, amount in creditors:
-        print(
-            "\t{}: {}{:.2f}".format(
-                name,
-                args.standard_currency if hasattr(
-                    args, "standard_currency") else "",
-                amount,
-            )
-        )
-    print("Debtors")
-    for name, amount in debtors:
-        print(
-            "\t{}: {}{:.2f}".format(
-                name,
-                args.standard_currency if hasattr(
-                    args, "standard_currency") else "",
-                amount,
-            )
-        )
-    print(SPLIT_LN)
+    std_currency = args.standard_currency or ""
+    # One write for the whole listing rather than a print per member.
+    lines = ["Creditors:"]
+    lines += [f"\t{name}: {std_currency}{amount:.2f}" for name, amount in creditors]
+    lines.append("Debtors")
+    lines += [f"\t{name}: {std_currency}{amount:.2f}" for name, amount in debtors]
+    lines.append(SPLIT_LN)
+    print("\n".join(lines))
 
-    equiv = graph.simplest_equiv(g)
+    equiv = graph.greedy_equiv(g) if args.greedy else graph.simplest_equiv(g)
     coln_amount = ("Amount" 
-                   if not hasattr(args, "standard_currency") 
+                   if args.standard_currency is None 
                    else f"Amount ({args.standard_currency})")
     dumped_df = equiv.dump(col_amount=coln_amount)
 
@@ -138,9 +134,9 @@ def main():
     print(dumped_df)
     print(SPLIT_LN)
 
-    if hasattr(args, "result_dump_path"):
-        dumped_df.to_csv(args.result_dump_path)
+    if args.result_dump_path is not None:
+        dumped_df.to_csv(args.result_dump_path, index=False, lineterminator="\n")
         print(f"Results are dumped to {args.result_dump_path}")
-    if hasattr(args, "details_dump_path"):
-        loader.get_preprocessed_data().to_csv(args.details_dump_path)
+    if args.details_dump_path is not None:
+        loader.get_preprocessed_data().to_csv(args.details_dump_path, index=False, lineterminator="\n")
         print(f"Proprocessing details are dumped to {args.details_dump_path}")
\ No newline at end of file
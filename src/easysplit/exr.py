@@ -11,25 +11,62 @@ Args:
         The date should be in one of the ISO format, e.g. 'YYYY-MM-DD'.
 """
 
-from collections import defaultdict
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple, Iterable
 
 class ExchangeRates:
+    __slots__ = ("_std_currency", "_rates", "_std_rate_cache")
+
     def __init__(self, std_currency: str = "HKD") -> None:
-        self.std_currency = std_currency
-        self._rates = defaultdict(dict)
+        self._std_currency = std_currency
+        self._rates: Dict[Tuple[str, str], float] = {}  # (base, quote) -> rate
+        self._std_rate_cache = None  # rate_table_to(std_currency), reset on every add_rate
+
+    @property
+    def std_currency(self) -> str:
+        return self._std_currency
         
     def add_rate(self, base_currency: str, quote_currency: str, rate: float) -> None:
-        if quote_currency in self._rates[base_currency]:
+        if (base_currency, quote_currency) in self._rates:
             raise ValueError(f"The exchange rate {base_currency}/{quote_currency} is already added.")
-        self._rates[base_currency][quote_currency] = rate
-        self._rates[quote_currency][base_currency] = 1 / rate
+        self._rates[base_currency, quote_currency] = rate
+        self._rates[quote_currency, base_currency] = 1 / rate
+        self._std_rate_cache = None
         
     def get_rate(self, base_currency: str, quote_currency: str) -> float:
         if base_currency == quote_currency:
             return 1.0
-        if base_currency not in self._rates:
+        rate = self._rates.get((base_currency, quote_currency))
+        if rate is None:
             raise ValueError(f"Exchange rate {base_currency}/{quote_currency} is NOT provided.")
-        return self._rates[base_currency][quote_currency]
+        return rate
 
     def to_std(self, from_currency: str, amount: float) -> float:
-        return amount * self.get_rate(from_currency, self.std_currency)
+        return amount * self.rate_to_std(from_currency)
+
+    def std_rate_table(self) -> dict:
+        """Rates from every known currency to the standard one, built once until a rate is added."""
+        if self._std_rate_cache is None:
+            self._std_rate_cache = self.rate_table_to(self._std_currency)
+        return self._std_rate_cache
+
+    def rate_to_std(self, from_currency: str) -> float:
+        rate = self.std_rate_table().get(from_currency)
+        if rate is None:
+            raise ValueError(f"Exchange rate {from_currency}/{self._std_currency} is NOT provided.")
+        return rate
+
+    def rate_vector(self, currencies: Iterable[str]) -> np.ndarray:
+        """Rates to the standard currency for each of the currencies, NaN where no rate is provided."""
+        # Look the rates up once per distinct currency, then gather them by code.
+        codes, uniques = pd.factorize(np.asarray(currencies, dtype="object"))
+        std_rates = self.std_rate_table()
+        rates_by_code = np.array([std_rates.get(c, np.nan) for c in uniques] + [np.nan])  # -1 is a missing currency
+        return rates_by_code[codes]
+
+    def rate_table_to(self, quote_currency: str) -> dict:
+        """Rates from every known currency to the quote currency, for converting whole columns at once."""
+        table = {base: rate for (base, quote), rate in self._rates.items() if quote == quote_currency}
+        table[quote_currency] = 1.0
+        return table
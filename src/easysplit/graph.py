@@ -1,11 +1,13 @@
 """Graph data structure for lending flows."""
 
 from .utils.logger import get_logger
+from .utils.jit import njit
 
-from copy import deepcopy
+import numpy as np
 import pandas as pd
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Iterable
 from collections import defaultdict
+import heapq
 import math
 
 logger = get_logger(__name__)
@@ -18,65 +20,134 @@ def is_equal(fp1, fp2):
 
 
 def is_zero(flt):
-    return is_equal(flt, 0.0)
+    # Same as is_equal(flt, 0.0), without the math.isclose call on this hot path.
+    return -ABS_TOL <= flt <= ABS_TOL
 
 
 class LendingGraph:
-    """A direct weighted graph, where weights are the lending flows."""
+    """A direct weighted graph, where weights are the lending flows.
+
+    Node names are interned to integer ids, and the flows are kept in a dense
+    adjacency matrix `_W`, where `_W[i, j]` is the amount lent by node i to node j.
+    """
 
     def __init__(self, log=logger) -> None:
-        self._adj_lt = defaultdict(lambda: defaultdict(float))
-        self.net_out_flow = defaultdict(float)
+        self._idx: Dict[str, int] = {}  # node name -> row/column of the matrix
+        self._names: List[str] = []
+        self._W = np.zeros((0, 0), dtype=np.float64)
+        self._net_out = None  # cache of _get_net_out(), reset on every edge mutation
         self.log = logger
 
+    @classmethod
+    def from_edges(cls, edges: Iterable[Tuple], log=logger) -> "LendingGraph":
+        """Build a graph from (creditor, debtor, amount) triples with one bulk insert."""
+        g = cls(log)
+        edges = list(edges)
+        if edges:
+            creditors, debtors, amounts = zip(*edges)
+            g.add_edges_bulk(creditors, debtors, amounts)
+        return g
+
+    def _get_id(self, node) -> int:
+        """Return the id of the node, registering it if not seen before."""
+        idx = self._idx.get(node)
+        if idx is None:
+            idx = len(self._names)
+            self._idx[node] = idx
+            self._names.append(node)
+            if idx == len(self._W):  # out of capacity, double the matrix
+                n_pad = max(idx, 4)
+                self._W = np.pad(self._W, ((0, n_pad), (0, n_pad)))
+        return idx
+
+    def _get_matrix(self) -> np.ndarray:
+        """View of the adjacency matrix among the registered nodes."""
+        n = len(self._names)
+        return self._W[:n, :n]
+
+    def _get_net_out(self) -> np.ndarray:
+        """Net amount lent out by each node, indexed by node id."""
+        if self._net_out is None:
+            w = self._get_matrix()
+            self._net_out = w.sum(axis=1) - w.sum(axis=0)
+        return self._net_out
+
+    @property
+    def net_out_flow(self) -> Dict[str, float]:
+        """Net amount lent out by each node, computed from the matrix on demand."""
+        return defaultdict(float, zip(self._names, self._get_net_out().tolist()))
+
     def vis(self) -> str:
         s = ""
-        for creditor in self._adj_lt.keys():
-            for debtor, amount in self._adj_lt[creditor].items():
-                s += f"{creditor} --{amount:.2f}--> {debtor}\n"
+        for i, j in zip(*np.nonzero(self._get_matrix())):
+            s += f"{self._names[i]} --{self._W[i, j]:.2f}--> {self._names[j]}\n"
         return s.strip()
 
     def get_nodes(self) -> List[str]:
-        lt = set(self._adj_lt.keys())
-        for creditor in self._adj_lt.keys():
-            lt.update(list(self._adj_lt[creditor].keys()))
-        return list(set(lt))
+        return list(self._names)
 
     def add_edge(self, creditor, debtor, amount) -> None:
-        assert (
-            creditor != debtor
-        ), f"creditor and debtor ({creditor}) should not be the same one!"
-        self._adj_lt[creditor][debtor] += amount
-        self.net_out_flow[creditor] += amount
-        self.net_out_flow[debtor] -= amount
-        if is_zero(self._adj_lt[creditor][debtor]):
-            self.remove_edge(creditor, debtor)
+        if creditor == debtor:
+            raise ValueError(f"creditor and debtor ({creditor}) should not be the same one!")
+        i, j = self._get_id(creditor), self._get_id(debtor)
+        amount += self._W.item(i, j)
+        self._W[i, j] = 0.0 if is_zero(amount) else amount
+        self._net_out = None
+
+    def add_edges_bulk(self, creditors: Iterable, debtors: Iterable, amounts: Iterable) -> None:
+        """Add the flows of the (creditor, debtor, amount) triples in one aggregated update.
+
+        Repeated pairs are accumulated, and near-zero weights are only snapped
+        to 0 once all the flows are in.
+        """
+        creditors, debtors = np.asarray(creditors, dtype="object"), np.asarray(debtors, dtype="object")
+        amounts = np.asarray(amounts, dtype=np.float64)
+        self_loops = creditors == debtors
+        if self_loops.any():
+            creditor = creditors[np.argmax(self_loops)]
+            raise ValueError(f"creditor and debtor ({creditor}) should not be the same one!")
+        # Register the nodes pair by pair, in the same order as add_edge would.
+        pairs = np.column_stack((creditors, debtors)).ravel()
+        ids = np.fromiter(map(self._get_id, pairs), dtype=np.intp, count=len(pairs))
+        i, j = ids[0::2], ids[1::2]
+        w = self._W  # taken after registering, as that may grow the matrix
+        np.add.at(w, (i, j), amounts)
+        w[i, j] = np.where(np.abs(w[i, j]) <= ABS_TOL, 0.0, w[i, j])
+        self._net_out = None
 
     def has_edge(self, creditor, debtor) -> bool:
-        return creditor in self._adj_lt and debtor in self._adj_lt[creditor]
+        return self.get_flow(creditor, debtor) != 0.0
 
     def get_edge(self, creditor, debtor) -> float:
-        assert self.has_edge(creditor, debtor)
-        return self._adj_lt[creditor][debtor]
+        amount = self.get_flow(creditor, debtor)
+        assert amount != 0.0, f"No edge from {creditor} to {debtor}."
+        return amount
 
-    def get_edges(self, creditor) -> List[Tuple]:
-        return self._adj_lt[creditor]
+    def get_edges(self, creditor) -> Dict[str, float]:
+        if creditor not in self._idx:
+            return {}
+        row = self._get_matrix()[self._idx[creditor]]
+        return {self._names[j]: float(row[j]) for j in np.flatnonzero(row)}
 
     def num_edges(self) -> int:
-        return sum(len(creditor) for creditor in self._adj_lt)
+        return int(np.count_nonzero(self._get_matrix()))
 
     def get_flow(self, creditor, debtor) -> float:
-        return self._adj_lt[creditor][debtor] if self.has_edge(creditor, debtor) else 0.0
+        i, j = self._idx.get(creditor), self._idx.get(debtor)
+        if i is None or j is None:
+            return 0.0
+        return self._W.item(i, j)
 
     def remove_edge(self, creditor, debtor) -> float:
         amount = self.get_edge(creditor, debtor)
-        self._adj_lt[creditor].pop(debtor, None)
-        self.net_out_flow[creditor] -= amount
-        self.net_out_flow[debtor] += amount
+        self._W[self._idx[creditor], self._idx[debtor]] = 0.0
+        self._net_out = None
         return amount
 
     def get_childs(self, node) -> List[str]:
-        return list(self._adj_lt[node].keys()) if node in self._adj_lt else []
+        if node not in self._idx:
+            return []
+        return [self._names[j] for j in np.flatnonzero(self._get_matrix()[self._idx[node]])]
 
     def dump(
         self,
@@ -85,31 +156,98 @@ class LendingGraph:
         col_amount: str = "Amount",
         precision: int = 2,
     ) -> pd.DataFrame:
-        # Create an empty DataFrame
-        data_types = {
-            col_creditor: "object",  # 'object' is typically used for strings
-            col_debtor: "object",
-            col_amount: "float64",  # 'float64' for floating point numbers
-        }
-        df = pd.DataFrame(columns=data_types.keys()).astype(data_types)
+        # Build the DataFrame in one shot from the netted matrix,
+        # flows in opposite directions between two nodes are netted off.
+        names = np.asarray(self._names, dtype="object")
+        w = self._get_matrix()
+        # Each pair of nodes once (i < j), oriented by the sign of its net flow.
+        net = np.triu(w - w.T, k=1)
+        # Only drop the pairs that print as zero, as a settlement may hold one-cent transfers.
+        i, j = np.nonzero(np.round(net, precision))
+        amounts = net[i, j]
+        lent = amounts > 0
+        creditors = names[np.where(lent, i, j)]
+        debtors = names[np.where(lent, j, i)]
+        amounts = np.abs(amounts)
+
+        return pd.DataFrame({
+            col_creditor: pd.Series(creditors, dtype="object"),
+            col_debtor: pd.Series(debtors, dtype="object"),
+            col_amount: np.round(np.asarray(amounts, dtype="float64"), precision),
+        })
 
-        for creditor in self._adj_lt:
-            for debtor in self._adj_lt[creditor]:
-                amount = round(self.get_flow(creditor, debtor), precision)
-                new_row = pd.DataFrame(
-                    [[creditor, debtor, amount]], columns=df.columns)
-                df = pd.concat([df, new_row], ignore_index=True)
 
-        return df
+def check_equiv(g1: LendingGraph, g2: LendingGraph) -> bool:
+    # Nodes with a zero net flow may be absent in a simplified graph.
+    net_out1, net_out2 = g1.net_out_flow, g2.net_out_flow
+    nodes = list(net_out1.keys() | net_out2.keys())
+    flows1 = np.fromiter((net_out1.get(node, 0.0) for node in nodes), dtype=np.float64, count=len(nodes))
+    flows2 = np.fromiter((net_out2.get(node, 0.0) for node in nodes), dtype=np.float64, count=len(nodes))
+    return bool(np.allclose(flows1, flows2, rtol=1e-09, atol=ABS_TOL))
+
+
+def _to_cents(amounts: np.ndarray) -> np.ndarray:
+    # Round the amounts to whole cents while keeping their (rounded) total:
+    # every amount is rounded down, and the cents left over go to the ones
+    # with the largest remainders, so each amount is off by less than a cent.
+    cents = np.asarray(amounts, dtype=np.float64) * 100
+    floors = np.floor(cents)
+    n_up = int(round(cents.sum() - floors.sum()))
+    rounded = floors.astype(np.int64)
+    rounded[np.argsort(floors - cents, kind="stable")[:n_up]] += 1
+    return rounded
+
+
+def _split_net_out(g: LendingGraph) -> Tuple[defaultdict, defaultdict]:
+    # Outstanding amounts of the creditors and debtors of the graph in integer cents, keyed by node id.
+    # The cents of all nodes still sum to zero, so the settlement is exact and never
+    # drops sub-cent remainders. It runs on node ids, names are only looked up by `_to_graph`.
+    creditors, debtors = defaultdict(int), defaultdict(int)
+    for node_id, net_out in enumerate(_to_cents(g._get_net_out()).tolist()):
+        if net_out > 0:
+            creditors[node_id] = net_out
+        elif net_out < 0:
+            debtors[node_id] = -net_out
+    return creditors, debtors
+
+
+def _to_graph(g: LendingGraph, transfers: List[Tuple]) -> LendingGraph:
+    # Graph of (creditor id, debtor id, amount in cents) transfers among the nodes of g.
+    # The amounts are written as they are, as add_edge would snap one-cent transfers to zero.
+    equiv_g = LendingGraph()
+    nodes = g.get_nodes()
+    for ldr, dbr, amount in transfers:
+        i, j = equiv_g._get_id(nodes[ldr]), equiv_g._get_id(nodes[dbr])
+        equiv_g._W[i, j] += amount / 100
+    return equiv_g
 
 
-def check_equiv(g1: LendingGraph, g2: LendingGraph) -> bool:
-    if set(g1.get_nodes()) != set(g2.get_nodes()):
-        return False
-    for node in g1.get_nodes():
-        if not is_equal(g1.net_out_flow[node], g2.net_out_flow[node]):
-            return False
-    return True
+def _match_exact(creditors: defaultdict, debtors: defaultdict) -> List[Tuple]:
+    # A creditor and a debtor with the same amount can always be settled by
+    # one transfer between them in some simplest scheme. Pair them up in a
+    # single pass over the amounts (in exact cents), and drop them from the dicts.
+    dbrs_by_amount = defaultdict(list)
+    for dbr, amount_dbr in debtors.items():
+        dbrs_by_amount[amount_dbr].append(dbr)
+
+    transfers = []
+    for ldr, amount_ldr in creditors.items():
+        dbrs = dbrs_by_amount.get(amount_ldr)
+        if dbrs:
+            transfers.append((ldr, dbrs.pop(), amount_ldr))
+    for ldr, dbr, _ in transfers:
+        del creditors[ldr]
+        del debtors[dbr]
+    return transfers
+
+
+def _greedy_transfers(creditors: defaultdict, debtors: defaultdict) -> List[Tuple]:
+    nodes = [*creditors.keys(), *debtors.keys()]
+    net_out = np.array([*creditors.values(), *(-amount for amount in debtors.values())], dtype=np.int64)
+    return [
+        (nodes[i], nodes[j], amount)
+        for i, j, amount in zip(*(ids.tolist() for ids in _settle(net_out)))
+    ]
 
 
 def simplest_equiv(g: LendingGraph, log=logger) -> LendingGraph:
@@ -119,91 +257,151 @@ def simplest_equiv(g: LendingGraph, log=logger) -> LendingGraph:
     # Construct a weighted graph with LEAST number of edges connecting nodes from two different sets.
     # The sum of the weights of all edges connecting to a node should be equal to the node value.
 
-    # Algorithm: DP
-
-    # def _status_tag(creditors, debtors) -> str:
-    #     tag = ""
-    #     for node in sorted(creditors):
-    #         tag += f"L({node}:{creditors[node]}),"
-    #     for node in sorted(debtors):
-    #         tag += f"D({node}:{debtors[node]}),"
-    #     return tag
-
-    # def _update_memo(tag: str, res: LendingGraph, memo: Dict) -> None:
-    #     if tag not in memo:
-    #         memo[tag] = res
-    #     else:
-    #         if memo[tag].num_edges() > res.num_edges():
-    #             memo[tag] = res
-
-    def _dict_all_zero(dt) -> bool:
-        for val in dt.values():
-            if not is_zero(val):
-                return False
-        return True
+    # Algorithm: DP (depth-first search over transfers, with memoization and branch-and-bound)
+
+    def _status_tag(creditors: defaultdict, debtors: defaultdict) -> Tuple:
+        # Canonical key of the outstanding amounts (in cents) of a search state.
+        return tuple(creditors.values()) + (None,) + tuple(debtors.values())
+
+    def _transfers(creditors: defaultdict, debtors: defaultdict):
+        # Only the first creditor with an outstanding amount is branched on.
+        # It has to be settled by some debtor in any scheme, and whichever
+        # creditor is picked first the same set of states stays reachable,
+        # so restarting the search from every other creditor is redundant.
+        for ldr, amount_ldr in creditors.items():
+            if is_zero(amount_ldr):
+                continue
+            for dbr, amount_dbr in debtors.items():
+                if is_zero(amount_dbr):
+                    continue
+                yield ldr, dbr
+            return
 
     def _dp(
         creditors: defaultdict,
         debtors: defaultdict,
-        cur_g: LendingGraph,
-        # memo: Dict,
-        ans: LendingGraph = None,
-    ) -> LendingGraph:
-
-        log.debug("=" * 20)
-        log.debug("LEDNERS: ", creditors)
-        log.debug("DEBTORS: ", debtors)
-        log.debug("CUR_G:")
-        log.debug(cur_g.vis())
-        log.debug("ANS: ")
-        if ans is not None:
-            log.debug(ans.vis())
-
-        # tag = _status_tag(creditors, debtors)
-
-        if _dict_all_zero(creditors) and _dict_all_zero(debtors):
-            log.debug("Last layer of recursion.")
-            return (
-                deepcopy(cur_g)
-                if ans is None or cur_g.num_edges() < ans.num_edges()
-                else ans
-            )
-
-        for ldr in creditors.keys():
-            amount_ldr = creditors[ldr]
-            if is_zero(amount_ldr):
+        best_path: List[Tuple],
+    ) -> List[Tuple]:
+        # Depth-first search with an explicit stack instead of recursion.
+        # Each stack frame is an iterator over the transfers still to be tried
+        # at one depth; `path` holds the transfers applied to reach that depth.
+        # Search for a scheme with fewer transfers than `best_path`,
+        # and return the best (creditor, debtor, amount) transfers found.
+        path = []
+        best_n_edges = len(best_path)
+        # Least number of transfers with which each state has been reached.
+        memo: Dict[Tuple, int] = {}
+        # Numbers of creditors and debtors with outstanding amounts, kept up to
+        # date on every transfer so that a settled state is detected without a full scan.
+        n_ldrs = sum(not is_zero(amount) for amount in creditors.values())
+        n_dbrs = sum(not is_zero(amount) for amount in debtors.values())
+        stack = [_transfers(creditors, debtors)]
+        while stack:
+            transfer = next(stack[-1], None)
+            if transfer is None:
+                # All transfers at this depth are tried, backtrack.
+                stack.pop()
+                if path:
+                    ldr, dbr, amount, ldr_settled, dbr_settled = path.pop()
+                    n_ldrs += ldr_settled
+                    n_dbrs += dbr_settled
+                    creditors[ldr] += amount
+                    debtors[dbr] += amount
                 continue
 
-            for dbr in debtors.keys():
-                amount_dbr = debtors[dbr]
-                if is_zero(amount_dbr):
-                    continue
+            ldr, dbr = transfer
+            amount = min(creditors[ldr], debtors[dbr])
+            creditors[ldr] -= amount
+            debtors[dbr] -= amount
+            ldr_settled, dbr_settled = is_zero(creditors[ldr]), is_zero(debtors[dbr])
+            n_ldrs -= ldr_settled
+            n_dbrs -= dbr_settled
+            path.append((ldr, dbr, amount, ldr_settled, dbr_settled))
+
+            if n_ldrs == 0 and n_dbrs == 0:
+                log.debug("Last layer of search.")
+                if len(path) < best_n_edges:
+                    best_path = [(ldr, dbr, amount) for ldr, dbr, amount, *_ in path]
+                    best_n_edges = len(path)
+                stack.append(iter(()))  # backtrack right away
+                continue
 
-                amount = min(amount_ldr, amount_dbr)
+            # Bound: every outstanding creditor (and debtor) needs at least one
+            # more transfer, so this branch cannot beat the best scheme found.
+            if len(path) + max(n_ldrs, n_dbrs) >= best_n_edges:
+                stack.append(iter(()))
+                continue
 
-                creditors[ldr] -= amount
-                debtors[dbr] -= amount
-                cur_g.add_edge(ldr, dbr, amount)
+            # Memoization: the state was already explored with no more transfers.
+            tag = _status_tag(creditors, debtors)
+            if memo.get(tag, math.inf) <= len(path):
+                stack.append(iter(()))
+                continue
+            memo[tag] = len(path)
 
-                ans = _dp(creditors, debtors, cur_g, ans)
-                # if dp_ans != ans:
-                #     ans = dp_ans
-                # _update_memo(tag, cur_g)
+            stack.append(_transfers(creditors, debtors))
 
-                creditors[ldr] += amount
-                debtors[dbr] += amount
-                cur_g.add_edge(ldr, dbr, -amount)
+        return best_path
 
-        return ans
+    creditors, debtors = _split_net_out(g)
+    transfers = _match_exact(creditors, debtors)
+    # The greedy scheme (exact, as it runs on cents) is a good upper bound to start pruning with.
+    transfers += _dp(creditors, debtors, _greedy_transfers(creditors, debtors))
+    equiv_g = _to_graph(g, transfers)
+
+    assert check_equiv(
+        g, equiv_g
+    ), f"G.NET_OUT = {g.net_out_flow}; EQ.NET_OUT = {equiv_g.net_out_flow}"
+
+    return equiv_g
 
-    creditors, debtors = defaultdict(float), defaultdict(float)
-    for node, net_out in g.net_out_flow.items():
-        if net_out > 0:
-            creditors[node] = net_out
-        elif net_out < 0:
-            debtors[node] = -net_out
 
-    equiv_g = _dp(creditors, debtors, LendingGraph())
+@njit(cache=True)
+def _settle(net_out: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Greedy matching kernel of `greedy_equiv` over node ids, JIT-compiled if Numba is available.
+    # Takes the net flows in integer cents summing to zero, so every remainder is
+    # carried exactly until it is settled, and returns the creditor ids, debtor ids
+    # and amounts (in cents) of the transactions.
+    # The largest outstanding creditor and debtor are kept at the top of two heaps
+    # (keyed by negated amounts), and a partially settled one is pushed back.
+    ldr_heap = [(-net_out[i], i) for i in range(len(net_out)) if net_out[i] > 0]
+    dbr_heap = [(net_out[i], i) for i in range(len(net_out)) if net_out[i] < 0]
+    heapq.heapify(ldr_heap)
+    heapq.heapify(dbr_heap)
+
+    n = len(net_out)
+    ldr_ids = np.empty(n, dtype=np.int64)
+    dbr_ids = np.empty(n, dtype=np.int64)
+    amounts = np.empty(n, dtype=np.int64)
+    k = 0
+    while len(ldr_heap) > 0 and len(dbr_heap) > 0:
+        neg_amount_ldr, ldr = heapq.heappop(ldr_heap)
+        neg_amount_dbr, dbr = heapq.heappop(dbr_heap)
+        amount = min(-neg_amount_ldr, -neg_amount_dbr)
+        ldr_ids[k], dbr_ids[k], amounts[k] = ldr, dbr, amount
+        k += 1
+
+        if -neg_amount_ldr > amount:
+            heapq.heappush(ldr_heap, (neg_amount_ldr + amount, ldr))
+        if -neg_amount_dbr > amount:
+            heapq.heappush(dbr_heap, (neg_amount_dbr + amount, dbr))
+    return ldr_ids[:k], dbr_ids[:k], amounts[:k]
+
+
+def greedy_equiv(g: LendingGraph) -> LendingGraph:
+    """Settle the net flows of the graph greedily.
+
+    The largest outstanding creditor is always matched with the largest
+    outstanding debtor, so each transaction settles at least one of them and
+    at most N-1 transactions are produced. Unlike `simplest_equiv`, the number
+    of transactions is not guaranteed to be the least, but it takes O(N log N)
+    time instead of an exhaustive search, which suits large groups.
+    Creditors and debtors with exactly the same amount are paired up first.
+    """
+    creditors, debtors = _split_net_out(g)
+    transfers = _match_exact(creditors, debtors)
+    transfers += _greedy_transfers(creditors, debtors)
+    equiv_g = _to_graph(g, transfers)
 
     assert check_equiv(
         g, equiv_g
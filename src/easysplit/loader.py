@@ -5,12 +5,16 @@ from . import graph
 from .exr import ExchangeRates
 from .config import *
 
-from typing import List
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from functools import partial
+import importlib.util
 
 
 class DataFormat:
+    __slots__ = ("col_creditor", "col_debtor", "col_tot_amount", "col_currency", "separator", "all_selector")
+
     def __init__(self,
                  col_creditor=DEFAULT_COL_CREDITOR,
                  col_debtor=DEFAULT_COL_DEBTOR,
@@ -37,12 +41,31 @@ class DataFormat:
             args.all_selector,
         )
 
+    def get_dtypes(self) -> dict:
+        """Explicit dtypes of the columns in use, passed to the readers to skip type inference."""
+        return {
+            self.col_creditor: str,
+            self.col_debtor: str,
+            self.col_tot_amount: "float64",
+            self.col_currency: str,
+        }
+
+
+
+def _has_calamine() -> bool:
+    # The calamine engine needs pandas >= 2.2 and the python-calamine package.
+    pd_version = tuple(int(v) for v in pd.__version__.split(".")[:2])
+    return pd_version >= (2, 2) and importlib.util.find_spec("python_calamine") is not None
+
+
+# The Rust-backed calamine engine parses sheets much faster than openpyxl (the default, None).
+EXCEL_ENGINE = "calamine" if _has_calamine() else None
 
 
 SUPPORT_FTYPES = {
-    ".csv": lambda x: pd.read_csv(x),
-    ".tsv": lambda x: pd.read_csv(x, sep="\t"),
-    ".xlsx": lambda x: pd.read_excel(x),
+    ".csv": pd.read_csv,
+    ".tsv": partial(pd.read_csv, sep="\t"),
+    ".xlsx": partial(pd.read_excel, engine=EXCEL_ENGINE),
 }
 
 
@@ -54,64 +77,74 @@ class Loader:
         exrs: ExchangeRates = None,
     ) -> None:
         file_path = Path(file_path)
-        assert file_path.exists(), f"The given path {file_path} does NOT exist"
-        assert file_path.is_file(), f"The given path {file_path} is NOT a path"
-
-        file_type = 'No Suffix' if file_path.suffix == '' else file_path.suffix
+        file_type = file_path.suffix or 'No Suffix'
         if file_type not in SUPPORT_FTYPES:
             raise ValueError("Unsupported format: {}. Only support files in format: {}. " 
                              "Please specify correct file path with supported format suffix.".format(
                 file_type,
                 ', '.join(SUPPORT_FTYPES.keys()),
             ))
+        assert file_path.exists(), f"The given path {file_path} does NOT exist"
+        assert file_path.is_file(), f"The given path {file_path} is NOT a path"
 
         self._file_path = file_path
-        self._df = SUPPORT_FTYPES[self._file_path.suffix](self._file_path)
         self._cfg = cfg
+        self._df = SUPPORT_FTYPES[file_type](self._file_path, dtype=cfg.get_dtypes())
         
+        self._exrs = exrs
         if exrs is not None:
             self._metacoln_std_tot_amount = f"Total Amount ({exrs.std_currency})"
-            self._exrs = exrs
-            self._df[self._metacoln_std_tot_amount] = self._df.apply(
-                lambda row: exrs.to_std(row[cfg.col_currency], row[cfg.col_tot_amount]),
-                axis=1,
-            )
+            currencies = self._df[cfg.col_currency]
+            rates = exrs.rate_vector(currencies)
+            if np.isnan(rates).any():
+                missing = ", ".join(sorted(set(currencies[np.isnan(rates)].astype(str))))
+                raise ValueError(f"Exchange rate to {exrs.std_currency} is NOT provided for: {missing}.")
+            self._df[self._metacoln_std_tot_amount] = rates * self._df[cfg.col_tot_amount].to_numpy(dtype=np.float64)
         else:
             print("No exchange rates provided. Run in the currency-agnostic way.")
-            self._df[self._metacoln_std_tot_amount] = self._df[cfg.col_tot_amount]
-        
-        def _split_names(s_names: str, splitter: str = DEFAULT_SEP) -> List[str]:
-            names = [name.strip() for name in s_names.split(splitter)]
-            return names
+            self._metacoln_std_tot_amount = "Total Amount"
+            self._df[self._metacoln_std_tot_amount] = self._df[cfg.col_tot_amount].to_numpy(dtype=np.float64)
         
+        # All name handling is done on whole columns with pandas string methods
+        s_creditors = self._df[self._cfg.col_creditor].str.strip()
+        split_debtors = self._df[self._cfg.col_debtor].str.split(self._cfg.separator, regex=False)
+        std_tot_amounts = self._df[self._metacoln_std_tot_amount]
+        creditor_is_all = self._is_all_selector(self._df[self._cfg.col_creditor])
+        debtor_is_all = self._is_all_selector(self._df[self._cfg.col_debtor])
+
+        # Long-form (creditor, debtor, amount) flows of the records with listed debtors,
+        # each debtor owes an equal share of the record (the creditor included).
+        listed_flows = pd.DataFrame({
+            "creditor": s_creditors,
+            "debtor": split_debtors,
+            "amount": std_tot_amounts / split_debtors.str.len(),
+        })[~debtor_is_all].explode("debtor")
+        listed_flows["debtor"] = listed_flows["debtor"].str.strip()
+
         # Collect all members
-        self._members = set()
-        for index, row in self._df.iterrows():
-            if row[self._cfg.col_creditor].lower().strip() != self._cfg.all_selector:
-                creditor = _split_names(row[self._cfg.col_creditor], cfg.separator)
-                if len(creditor) > 1: # Currently only support single creditor
-                    raise ValueError("Currently only support single creditor. "
-                                     "Please specify only one creditor in each record.")
-                self._members.update(creditor)
-            if row[self._cfg.col_debtor].lower().strip() != self._cfg.all_selector:
-                self._members.update(
-                    _split_names(row[self._cfg.col_debtor], self._cfg.separator)
-                )
+        named_creditors = s_creditors[~creditor_is_all]
+        if named_creditors.str.contains(cfg.separator, regex=False).any():
+            # Currently only support single creditor
+            raise ValueError("Currently only support single creditor. "
+                             "Please specify only one creditor in each record.")
+        self._members = set(named_creditors) | set(listed_flows["debtor"])
+
+        # Records for all members are shared among everyone (the creditor included).
+        shared_flows = pd.DataFrame({
+            "creditor": s_creditors,
+            "amount": std_tot_amounts / len(self._members),
+        })[debtor_is_all].merge(pd.DataFrame({"debtor": sorted(self._members)}), how="cross")
+        flows = pd.concat([listed_flows, shared_flows], ignore_index=True)
+        flows = flows[flows["creditor"] != flows["debtor"]]  # drop self-loops
 
         # Create lending graph
         self._g = graph.LendingGraph()
-        for index, row in self._df.iterrows():
-            creditor = row[self._cfg.col_creditor].strip()
-            if row[self._cfg.col_debtor].lower().strip() == self._cfg.all_selector:
-                debtors = self._members.copy()
-            else:
-                debtors = _split_names(row[self._cfg.col_debtor])
-            
-            pp_amount = row[self._metacoln_std_tot_amount] / len(debtors)
-            if creditor in debtors:  # TODO: unnecessary, self-loop and be eliminated in the graph
-                debtors.remove(creditor)
-            for debtor in debtors:
-                self._g.add_edge(creditor, debtor, pp_amount)
+        self._g.add_edges_bulk(
+            flows["creditor"].to_numpy(), flows["debtor"].to_numpy(), flows["amount"].to_numpy()
+        )
+
+    def _is_all_selector(self, col: pd.Series) -> np.ndarray:
+        return col.str.strip().str.lower().eq(self._cfg.all_selector).to_numpy()
 
     def get_graph(self):
         return self._g
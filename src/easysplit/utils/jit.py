@@ -0,0 +1,18 @@
+"""Optional JIT compilation of numeric kernels with Numba.
+
+Numba is not a hard requirement. When it is not installed, `njit` leaves the
+decorated function untouched, so the same kernel runs as plain Python/NumPy.
+"""
+
+try:
+    from numba import njit
+
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        # Support both the bare `@njit` and the `@njit(cache=True)` forms.
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
@@ -86,17 +86,17 @@ def get_logger(name=None, level="INFO", dump_dir=None):
         if not dump_dir.is_dir():
             if not dump_dir.exists():
                 configured_logger.warning(
-                    f"The given log directory path does NOT exist: {dump_dir.absolute()}"
+                    "The given log directory path does NOT exist: %s", dump_dir.absolute()
                 )
             else:
                 configured_logger.warning(
-                    f"The given log directory path is NOT a dir: {dump_dir.absolute()}"
+                    "The given log directory path is NOT a dir: %s", dump_dir.absolute()
                 )
 
             dump_dir = Path("./log")
             dump_dir.mkdir(exist_ok=True)
             configured_logger.warning(
-                f"Redirected the log directory to {dump_dir.absolute()}"
+                "Redirected the log directory to %s", dump_dir.absolute()
             )
         time_stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
         log_file = dump_dir / f"{configured_logger.name}-{time_stamp}.log"
@@ -114,7 +114,7 @@ if __name__ == "__main__":
     logger = get_logger()
     # Log messages with different levels
     logger.debug("This is a debug message")
-    logger.info(f"The logger name is : {logger.name}")
+    logger.info("The logger name is : %s", logger.name)
     logger.warning("This is a warning message")
     logger.error("This is an error message")
     logger.critical("This is a critical message")
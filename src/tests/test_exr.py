@@ -1,3 +1,5 @@
+import math
+
 from easysplit.exr import ExchangeRates
 
 
@@ -8,3 +10,21 @@ print("USD to HKD: ", exrs.get_rate("USD", "HKD"))
 res = exrs.to_std("USD", 100)
 print("100 USD to std (HKD): ", exrs.to_std("USD", 100))
 print("Convert back to USD", exrs.get_rate("HKD", "USD") * res)
+
+
+def test_rate_vector():
+    exrs = ExchangeRates("HKD")
+    exrs.add_rate("USD", "HKD", 7.8)
+    rates = exrs.rate_vector(["USD", "HKD", "KRW", None, "USD"])
+    assert rates[[0, 1, 4]].tolist() == [7.8, 1.0, 7.8]
+    assert math.isnan(rates[2]) and math.isnan(rates[3])
+
+
+def test_std_rate_table_is_rebuilt_on_add_rate():
+    exrs = ExchangeRates("HKD")
+    exrs.add_rate("USD", "HKD", 7.8)
+    assert exrs.std_rate_table() == {"USD": 7.8, "HKD": 1.0}
+    assert exrs.std_rate_table() is exrs.std_rate_table()  # cached
+    exrs.add_rate("HKD", "KRW", 173.0)
+    assert exrs.std_rate_table() == {"USD": 7.8, "HKD": 1.0, "KRW": 1 / 173.0}
+    assert exrs.rate_to_std("KRW") == 1 / 173.0
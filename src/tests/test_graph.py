@@ -0,0 +1,158 @@
+import numpy as np
+import pytest
+
+from easysplit.graph import (
+    ABS_TOL, LendingGraph, _settle, _split_net_out, check_equiv, greedy_equiv, simplest_equiv,
+)
+from easysplit.utils.jit import HAS_NUMBA
+
+
+def random_graph(n_people, n_edges, seed, round_prices=False):
+    rng = np.random.default_rng(seed)
+    creditors = rng.integers(n_people, size=n_edges)
+    debtors = (creditors + rng.integers(1, n_people, size=n_edges)) % n_people  # no self-loops
+    if round_prices:
+        # Few distinct prices, so that groups of people often settle among themselves.
+        amounts = rng.integers(1, 6, size=n_edges) * 5 + rng.choice([0.0, 0.004], size=n_edges)
+    else:
+        # Sub-cent amounts, as left by currency conversion.
+        amounts = rng.uniform(0.001, 100, size=n_edges).round(3)
+    return LendingGraph.from_edges(zip([f"P{i}" for i in creditors], [f"P{i}" for i in debtors], amounts))
+
+
+def min_num_transfers(g):
+    # Brute-force reference: each disjoint group of nodes whose net flows sum to zero
+    # can be settled with one transfer less than its size, so the least number of
+    # transfers is the number of outstanding nodes minus the most such groups.
+    # Bitmask DP over the subsets of the nodes, for small graphs only.
+    creditors, debtors = _split_net_out(g)
+    cents = [*creditors.values(), *(-amount for amount in debtors.values())]
+    n = len(cents)
+    sums = [0] * (1 << n)
+    n_groups = [0] * (1 << n)
+    for mask in range(1, 1 << n):
+        low = (mask & -mask).bit_length() - 1
+        sums[mask] = sums[mask & (mask - 1)] + cents[low]
+        n_groups[mask] = max(n_groups[mask & ~(1 << i)] for i in range(n) if mask >> i & 1) + (sums[mask] == 0)
+    return n - n_groups[-1]
+
+
+@pytest.fixture(scope="module")
+def trip_graph():
+    # A trip with a ring of debts, built and simplified once for the whole module.
+    # Tests must not mutate either graph.
+    g = LendingGraph.from_edges([
+        ("Alan", "Cathy", 30.0),
+        ("Cathy", "Vivian", 30.0),
+        ("Vivian", "Alan", 10.0),
+        ("Cabin", "Alan", 25.0),
+        ("Cabin", "Vivian", 5.0),
+    ])
+    return g, simplest_equiv(g)
+
+
+def test_read_paths_do_not_register_nodes():
+    g = LendingGraph()
+    g.add_edge("Alan", "Cathy", 10.0)
+
+    assert not g.has_edge("Vivian", "Alan")
+    assert g.get_flow("Cabin", "Vivian") == 0.0
+    assert g.get_edges("Vivian") == {}
+    assert g.get_childs("Cabin") == []
+    assert sorted(g.get_nodes()) == ["Alan", "Cathy"]
+
+
+def test_simplest_equiv_preserves_net_flows(trip_graph):
+    g, simplified = trip_graph
+    assert check_equiv(g, simplified)
+
+
+def test_simplest_equiv_is_simpler(trip_graph):
+    g, simplified = trip_graph
+    assert simplified.num_edges() < g.num_edges()
+    assert simplified.num_edges() <= len(g.get_nodes()) - 1
+
+
+def test_net_out_flow_is_zero_sum():
+    creditors = ["Alan", "Cathy", "Alan", "Vivian", "Cabin", "Cathy"]
+    debtors = ["Cathy", "Vivian", "Cabin", "Alan", "Alan", "Alan"]
+    amounts = [12.5, 40.0, 7.25, 3.0, 18.0, 0.75]
+    g = LendingGraph.from_edges(zip(creditors, debtors, amounts))
+
+    # Reference net flows straight from the edge list.
+    names, inv = np.unique(creditors + debtors, return_inverse=True)
+    inv_c, inv_d = inv[:len(creditors)], inv[len(creditors):]
+    net = (np.bincount(inv_c, weights=amounts, minlength=len(names))
+           - np.bincount(inv_d, weights=amounts, minlength=len(names)))
+
+    net_out_flow = g.net_out_flow
+    assert abs(net.sum()) < ABS_TOL
+    matched = np.isclose([net_out_flow[name] for name in names], net, atol=ABS_TOL)
+    assert matched.all(), f"Net out flows differ for: {list(names[~matched])}"
+
+
+@pytest.mark.parametrize("n_people", [50, 500])
+def test_greedy_equiv_on_random_graphs(n_people):
+    g = random_graph(n_people, 10 * n_people, seed=n_people)
+    settled = greedy_equiv(g)
+    assert check_equiv(g, settled)
+    assert settled.num_edges() <= len(g.get_nodes()) - 1
+
+
+@pytest.mark.parametrize("round_prices", [False, True])
+@pytest.mark.parametrize("seed", range(100))
+def test_simplest_equiv_on_random_graphs(seed, round_prices):
+    g = random_graph(8, 12, seed, round_prices)
+    simplified = simplest_equiv(g)
+    assert check_equiv(g, simplified)
+    assert simplified.num_edges() == min_num_transfers(g)
+
+
+def test_add_edges_bulk_matches_add_edge():
+    creditors = ["Alan", "Cathy", "Alan", "Vivian", "Alan"]
+    debtors = ["Cathy", "Vivian", "Cabin", "Alan", "Cathy"]
+    amounts = [12.5, 40.0, 7.25, 3.0, -12.5]
+    g = LendingGraph()
+    for creditor, debtor, amount in zip(creditors, debtors, amounts):
+        g.add_edge(creditor, debtor, amount)
+    bulk = LendingGraph()
+    bulk.add_edges_bulk(creditors, debtors, amounts)
+
+    assert bulk.get_nodes() == g.get_nodes()
+    assert not bulk.has_edge("Alan", "Cathy")  # repeated pairs cancel out
+    assert dict(bulk.net_out_flow) == pytest.approx(dict(g.net_out_flow), abs=ABS_TOL)
+
+
+def test_from_edges():
+    assert LendingGraph.from_edges([]).get_nodes() == []
+    g = LendingGraph.from_edges([("Alan", "Cathy", 10.0), ("Cathy", "Alan", 4.0), ("Alan", "Cathy", 2.0)])
+    assert g.get_flow("Alan", "Cathy") == pytest.approx(12.0)
+    assert g.get_flow("Cathy", "Alan") == pytest.approx(4.0)
+
+
+@pytest.mark.parametrize("settle", [simplest_equiv, greedy_equiv])
+def test_sub_cent_remainders_are_settled(settle):
+    # Remainders under a cent used to be dropped, and adding up on D5 they broke the equivalence.
+    edges = [("M", "D5", 0.018)]
+    for i in range(2):
+        edges += [(f"C{i}", f"D{i}", 9.0), (f"C{i}", "M", 1.009), ("M", f"D{i}", 1.0)]
+    g = LendingGraph.from_edges(edges)
+    assert check_equiv(g, settle(g))
+
+
+@pytest.mark.parametrize("settle", [simplest_equiv, greedy_equiv])
+@pytest.mark.parametrize("edges", [
+    [("A", "B", 20.0), ("C", "D", 3.008), ("D", "C", 3.0)],  # sub-cent remainder
+    [("A", "B", 20.0), ("C", "D", 5.01), ("D", "C", 5.0)],  # one-cent debt
+])
+def test_dump_keeps_one_cent_transfers(settle, edges):
+    equiv = settle(LendingGraph.from_edges(edges))
+    assert len(equiv.dump()) == equiv.num_edges()
+
+
+@pytest.mark.skipif(not HAS_NUMBA, reason="numba is not installed")
+def test_settle_compiles_with_numba():
+    ldr_ids, dbr_ids, amounts = _settle(np.array([300, -100, -150, -50], dtype=np.int64))
+    assert _settle.signatures  # compiled, not run as plain Python
+    assert ldr_ids.tolist() == [0, 0, 0]
+    assert sorted(zip(dbr_ids.tolist(), amounts.tolist())) == [(1, 100), (2, 150), (3, 50)]
@@ -0,0 +1,67 @@
+import pytest
+
+from easysplit import Loader, DataFormat
+from easysplit.exr import ExchangeRates
+
+
+def write_csv(tmp_path, text, name="records.csv"):
+    path = tmp_path / name
+    path.write_text(text)
+    return path
+
+
+def net_out_flow(ldr):
+    return dict(ldr.get_graph().net_out_flow)
+
+
+def test_creditor_among_own_debtors(tmp_path):
+    # Alan pays 30 for three, his own share stays with him.
+    path = write_csv(tmp_path, "Creditor,Debtor,Amount\nAlan,\"Alan, Cathy, Vivian\",30\n")
+    ldr = Loader(path)
+    assert ldr.get_members() == {"Alan", "Cathy", "Vivian"}
+    assert net_out_flow(ldr) == pytest.approx({"Alan": 20.0, "Cathy": -10.0, "Vivian": -10.0})
+
+
+def test_all_selector_is_trimmed_and_case_insensitive(tmp_path):
+    path = write_csv(tmp_path, "Creditor,Debtor,Amount\nAlan,Cathy,10\nCathy, ALL ,30\nVivian,Alan,6\n")
+    ldr = Loader(path)
+    assert ldr.get_members() == {"Alan", "Cathy", "Vivian"}
+    # The 30 for all is shared among the three members, Cathy included.
+    assert net_out_flow(ldr) == pytest.approx({"Alan": 10.0 - 10.0 - 6.0, "Cathy": -10.0 + 20.0, "Vivian": 6.0 - 10.0})
+
+
+def test_custom_separator(tmp_path):
+    path = write_csv(tmp_path, "Creditor,Debtor,Amount\nAlan,Cathy; Vivian,20\n")
+    ldr = Loader(path, DataFormat(separator=";"))
+    assert ldr.get_members() == {"Alan", "Cathy", "Vivian"}
+    assert net_out_flow(ldr) == pytest.approx({"Alan": 20.0, "Cathy": -10.0, "Vivian": -10.0})
+
+
+def test_repeated_debtor_owes_each_share(tmp_path):
+    path = write_csv(tmp_path, "Creditor,Debtor,Amount\nAlan,\"Cathy, Vivian, Cathy\",30\n")
+    ldr = Loader(path)
+    assert net_out_flow(ldr) == pytest.approx({"Alan": 30.0, "Cathy": -20.0, "Vivian": -10.0})
+
+
+def test_without_exchange_rates(tmp_path):
+    # No currency column is needed, the amounts are taken as they are.
+    path = write_csv(tmp_path, "Creditor,Debtor,Amount\nAlan,Cathy,12.5\n")
+    ldr = Loader(path)
+    assert ldr.get_preprocessed_data()["Total Amount"].tolist() == [12.5]
+    assert net_out_flow(ldr) == pytest.approx({"Alan": 12.5, "Cathy": -12.5})
+
+
+def test_amounts_converted_to_std_currency(tmp_path):
+    path = write_csv(tmp_path, "Creditor,Debtor,Amount,Currency\nAlan,Cathy,10,USD\nCathy,Alan,20,HKD\n")
+    exrs = ExchangeRates("HKD")
+    exrs.add_rate("USD", "HKD", 7.8)
+    ldr = Loader(path, exrs=exrs)
+    assert ldr.get_preprocessed_data()["Total Amount (HKD)"].tolist() == pytest.approx([78.0, 20.0])
+
+
+def test_missing_currency(tmp_path):
+    path = write_csv(tmp_path, "Creditor,Debtor,Amount,Currency\nAlan,Cathy,10,USD\nCathy,Alan,20,KRW\nAlan,Cathy,5,\n")
+    exrs = ExchangeRates("HKD")
+    exrs.add_rate("USD", "HKD", 7.8)
+    with pytest.raises(ValueError, match="NOT provided for: KRW, nan"):
+        Loader(path, exrs=exrs)